@@ -0,0 +1,130 @@
+"""
+fast_sim.py — 小比特线路的 NumPy 态矢量快速路径
+
+职责：
+  对 num_qubits <= MAX_QUBITS 的线路（态矢量维度 <= 64）直接用 NumPy 演化态矢量并采样，
+  省去 Aer 的线路转换、任务调度与 C++/Python 往返开销
+
+设计约束：
+  - 只支持：任意单比特门、单控制位的受控单比特门（cx/cz/cy/crz 等）、swap、barrier、
+    末尾测量；出现 reset、条件门、测量后再作用的门、多经典寄存器等情况时返回 None，
+    由调用方回退到 Aer
+  - 结果格式与 Aer get_counts() 一致：经典比特 0 位于字符串最右侧
+"""
+
+import numpy as np
+
+MAX_QUBITS = 6
+
+_rng = np.random.default_rng()
+
+_SWAP = np.array([[0, 1], [1, 0]], dtype=complex)
+
+# 两比特受控门矩阵中控制位（qargs[0]，小端序最低位）为 1 的子块下标
+_CTRL1 = np.ix_([1, 3], [1, 3])
+
+def _pair_indices(n, target, control=-1):
+    """
+    返回 (i0, i1)：target 位为 0/1 的基矢下标对
+    control >= 0 时只保留 control 位为 1 的下标
+    """
+    idx  = np.arange(1 << n)
+    mask = ((idx >> target) & 1) == 0
+    if control >= 0:
+        mask &= ((idx >> control) & 1) == 1
+    i0 = idx[mask]
+    return i0, i0 | (1 << target)
+
+def _compile(qc):
+    """
+    把线路翻译为 [(matrix, i0, i1)] 操作序列与测量映射 {clbit: qubit}
+    线路包含不支持的指令时返回 None
+    """
+    n = qc.num_qubits
+    if len(qc.cregs) != 1 or qc.cregs[0].size != qc.num_clbits:
+        return None
+
+    ops      = []
+    measures = {}
+    measured = set()
+
+    for inst in qc.data:
+        op     = inst.operation
+        name   = op.name
+        qubits = [qc.find_bit(q).index for q in inst.qubits]
+
+        if name == "barrier":
+            continue
+        if getattr(op, "condition", None) is not None:
+            return None
+        if name == "measure":
+            measures[qc.find_bit(inst.clbits[0]).index] = qubits[0]
+            measured.add(qubits[0])
+            continue
+        # 测量后继续作用的门需要中途坍缩，不在快速路径范围内
+        if measured.intersection(qubits):
+            return None
+
+        if name == "id":
+            continue
+        if name == "swap":
+            a, b = qubits
+            # 只有 a、b 两位取值不同的基矢需要交换：取 a=0,b=1 与 a=1,b=0 成对
+            i0, _ = _pair_indices(n, a, b)
+            ops.append((_SWAP, i0, i0 ^ (1 << a) ^ (1 << b)))
+            continue
+
+        try:
+            if len(qubits) == 1:
+                ops.append((op.to_matrix(), *_pair_indices(n, qubits[0])))
+            elif (len(qubits) == 2
+                  and getattr(op, "num_ctrl_qubits", 0) == 1
+                  and op.ctrl_state == 1):
+                # 取完整矩阵的控制位=1 子块，而非 base_gate 矩阵：
+                # 受控门可能在控制位为 1 时附加相位（如 cu 的 gamma）
+                ops.append((op.to_matrix()[_CTRL1],
+                            *_pair_indices(n, qubits[1], qubits[0])))
+            else:
+                return None
+        except Exception:
+            # 无矩阵定义的指令（如 reset、自定义不透明门）
+            return None
+
+    if not measures:
+        return None
+    return ops, measures
+
+def simulate(qc, shots):
+    """
+    执行线路并采样 shots 次
+    返回 counts dict（格式同 Aer），线路不在快速路径支持范围内时返回 None
+    """
+    if qc.num_qubits > MAX_QUBITS:
+        return None
+
+    program = _compile(qc)
+    if program is None:
+        return None
+    ops, measures = program
+
+    sv    = np.zeros(1 << qc.num_qubits, dtype=complex)
+    sv[0] = 1.0
+    for mat, i0, i1 in ops:
+        a, b   = sv[i0], sv[i1]
+        sv[i0] = mat[0, 0] * a + mat[0, 1] * b
+        sv[i1] = mat[1, 0] * a + mat[1, 1] * b
+
+    probs  = np.abs(sv) ** 2
+    probs /= probs.sum()
+    hits   = _rng.multinomial(shots, probs)
+
+    # 基矢下标 -> 经典比特串（clbit 0 在最右），未测量的经典比特为 0
+    clbits = range(qc.num_clbits - 1, -1, -1)
+    counts = {}
+    for basis in np.flatnonzero(hits):
+        key = "".join(
+            "1" if c in measures and (basis >> measures[c]) & 1 else "0"
+            for c in clbits
+        )
+        counts[key] = counts.get(key, 0) + int(hits[basis])
+    return counts
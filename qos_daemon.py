@@ -16,16 +16,25 @@ qos_daemon.py — QuantumOS 后端守护进程
 import os
 import sys
 import time
-import fcntl
+import errno
 import ctypes
+import struct
+import select
 import signal
 import logging
+import threading
+import functools
+import multiprocessing
+import concurrent.futures
 import argparse
 
-from qiskit import QuantumCircuit
+import numpy as np
+from qiskit import QuantumCircuit, ClassicalRegister
 from qiskit.qasm2 import loads as qasm2_loads
 from qiskit_aer import AerSimulator
 
+import fast_sim
+
 # ================================================================
 # 常量（必须与内核 quantum_types.h 完全一致，不得单独修改）
 # ================================================================
@@ -41,6 +50,16 @@ QIOC_MAGIC  = ord('Q')
 QIOC_FETCH  = (QIOC_MAGIC << 8) | 6
 QIOC_COMMIT = (QIOC_MAGIC << 8) | 7
 
+# 批量 FETCH/COMMIT：一次 ioctl 传递最多 QUANTUM_BATCH_MAX 个任务
+# 内核不支持时返回 ENOTTY/EINVAL，daemon 自动回退到单任务 ioctl
+QIOC_FETCH_BATCH  = (QIOC_MAGIC << 8) | 8
+QIOC_COMMIT_BATCH = (QIOC_MAGIC << 8) | 9
+QUANTUM_BATCH_MAX = 8
+
+# QuantumFetchReq.format：qasm 缓冲区的编码方式
+QIR_FORMAT_QASM   = 0   # 纯 QASM 文本
+QIR_FORMAT_BINARY = 1   # 二进制门序列（见 _build_circuit_from_binary）
+
 # ================================================================
 # 日志配置
 # ================================================================
@@ -75,6 +94,7 @@ class QuantumFetchReq(ctypes.Structure):
         ("sub_index",        ctypes.c_int),
         ("num_sub_circuits", ctypes.c_int),
         ("phys_qubits",      ctypes.c_int * QUANTUM_MAX_QUBITS),  # 64*4=256 bytes
+        ("format",           ctypes.c_int),                       # QIR_FORMAT_*
     ]
 
 class QuantumCommitReq(ctypes.Structure):
@@ -94,14 +114,33 @@ class QuantumCommitReq(ctypes.Structure):
         ("sub_index",    ctypes.c_int),
     ]
 
+class QuantumFetchBatch(ctypes.Structure):
+    """
+    对应内核 struct quantum_fetch_batch
+    调用前 count 为容量上限，返回后为实际取出的任务数
+    """
+    _fields_ = [
+        ("count", ctypes.c_int),
+        ("reqs",  QuantumFetchReq * QUANTUM_BATCH_MAX),
+    ]
+
+class QuantumCommitBatch(ctypes.Structure):
+    """
+    对应内核 struct quantum_commit_batch
+    """
+    _fields_ = [
+        ("count",   ctypes.c_int),
+        ("commits", QuantumCommitReq * QUANTUM_BATCH_MAX),
+    ]
+
 # ================================================================
 # 启动时结构体大小校验
 # ================================================================
 
 # 期望值（根据内核实际 sizeof 计算）：
-#   QuantumFetchReq：5*4 + 4096 + 3*4 + 64*4 = 20 + 4096 + 12 + 256 = 4384
+#   QuantumFetchReq：5*4 + 4096 + 3*4 + 64*4 + 4 = 20 + 4096 + 12 + 256 + 4 = 4388
 #   QuantumCommitReq：4*4 + 32*192 + 32*4 + 4 + 128 + 2*4 = 16+6144+128+4+128+8 = 6428
-EXPECTED_FETCH_SIZE  = 4384
+EXPECTED_FETCH_SIZE  = 4388
 EXPECTED_COMMIT_SIZE = 6428
 
 def verify_struct_sizes():
@@ -141,21 +180,81 @@ def verify_struct_sizes():
 # ioctl 封装
 # ================================================================
 
+# 直接调用 libc ioctl(2)
+# fcntl.ioctl 每次调用都要做参数校验和通用缓冲区封送；ctypes.CDLL 的外部调用
+# 会在系统调用期间释放 GIL，且直接传结构体指针，无额外拷贝
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.ioctl.argtypes = [ctypes.c_int, ctypes.c_ulong, ctypes.c_void_p]
+_libc.ioctl.restype  = ctypes.c_int
+
+def _ioctl(fd, cmd, buf):
+    """对 buf（ctypes 结构体）执行 ioctl，失败时抛出 OSError（与 fcntl.ioctl 一致）"""
+    if _libc.ioctl(fd, cmd, ctypes.addressof(buf)) < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+# FETCH 缓冲区空闲链表
+# 每个 QuantumFetchReq 为 4384 字节，每次轮询都新建会带来一次清零和分配开销，
+# 改为复用：ioctl_fetch 从链表弹出，任务 COMMIT 完成后由 release_fetch_req 归还
+_fetch_free = []
+
+def alloc_fetch_req():
+    """从空闲链表取一个 FETCH 缓冲区，链表为空时新建"""
+    if _fetch_free:
+        return _fetch_free.pop()
+    return QuantumFetchReq()
+
+def release_fetch_req(req):
+    """归还 FETCH 缓冲区，供下一次轮询复用"""
+    _fetch_free.append(req)
+
+# COMMIT 缓冲区空闲链表（6428 字节），由主线程分配/归还
+# 复用时只清零上一个任务实际写过的区域，而不是整块 memset
+_commit_free = []
+
+def alloc_commit_req():
+    """从空闲链表取一个已清理的 COMMIT 缓冲区，链表为空时新建"""
+    if not _commit_free:
+        return QuantumCommitReq()
+
+    commit = _commit_free.pop()
+    # num_outcomes 覆盖了上一个任务写入 keys/counts 的所有行
+    n = commit.num_outcomes
+    if n:
+        ctypes.memset(ctypes.addressof(commit.keys), 0, n * QUANTUM_KEY_LEN)
+        ctypes.memset(ctypes.addressof(commit.counts), 0,
+                      n * ctypes.sizeof(ctypes.c_int))
+    commit.success      = 0
+    commit.num_outcomes = 0
+    commit.error_code   = 0
+    commit.error_info   = b""
+    return commit
+
+def release_commit_req(commit):
+    """归还 COMMIT 缓冲区"""
+    _commit_free.append(commit)
+
 def ioctl_fetch(fd):
     """
     调用 QIOC_FETCH，取出待执行任务
     返回 QuantumFetchReq（有任务）或 None（无任务/EAGAIN）
+    返回的缓冲区用完后须调用 release_fetch_req() 归还
     """
-    req = QuantumFetchReq()
+    req = alloc_fetch_req()
+    # 复用的缓冲区残留上一个任务的 qid，必须先清零，否则无任务时会被误判
+    # format 位于结构体末尾，未写该字段的内核版本下保持 0（QASM）
+    req.qid    = 0
+    req.format = QIR_FORMAT_QASM
     try:
-        fcntl.ioctl(fd, QIOC_FETCH, req)
+        _ioctl(fd, QIOC_FETCH, req)
     except OSError as e:
-        import errno as errno_mod
-        if e.errno == errno_mod.EAGAIN:
+        release_fetch_req(req)
+        if e.errno == errno.EAGAIN:
             return None  # 无待执行任务，正常情况
         log.warning("QIOC_FETCH failed: %s", e)
         return None
     if req.qid <= 0:
+        release_fetch_req(req)
         return None
     return req
 
@@ -165,79 +264,470 @@ def ioctl_commit(fd, commit):
     返回 True=成功，False=失败（内核侧会超时清理）
     """
     try:
-        fcntl.ioctl(fd, QIOC_COMMIT, commit)
+        _ioctl(fd, QIOC_COMMIT, commit)
         return True
     except OSError as e:
         log.warning("QIOC_COMMIT failed: %s", e)
         return False
 
+# 批量 ioctl 缓冲区（仅主线程使用）及内核支持情况，首次 ENOTTY/EINVAL 后置 False
+_fetch_batch  = QuantumFetchBatch()
+_commit_batch = QuantumCommitBatch()
+_fetch_batch_supported  = True
+_commit_batch_supported = True
+
+def _batch_unsupported(e):
+    """判断 ioctl 错误是否表示内核不认识该命令字"""
+    return e.errno in (errno.ENOTTY, errno.EINVAL)
+
+def ioctl_fetch_batch(fd, max_count):
+    """
+    通过 QIOC_FETCH_BATCH 一次取出最多 max_count 个任务
+    返回 QuantumFetchReq 列表（可能为空），用完后须逐个 release_fetch_req()
+    内核不支持批量命令时回退为单次 ioctl_fetch
+    """
+    global _fetch_batch_supported
+
+    max_count = min(max_count, QUANTUM_BATCH_MAX)
+    if _fetch_batch_supported:
+        batch       = _fetch_batch
+        batch.count = max_count
+        try:
+            _ioctl(fd, QIOC_FETCH_BATCH, batch)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            if not _batch_unsupported(e):
+                log.warning("QIOC_FETCH_BATCH failed: %s", e)
+                return []
+            log.info("QIOC_FETCH_BATCH not supported, using QIOC_FETCH")
+            _fetch_batch_supported = False
+        else:
+            reqs = []
+            for i in range(min(batch.count, max_count)):
+                if batch.reqs[i].qid <= 0:
+                    continue
+                # 拷出到独立缓冲区，批量缓冲区可立即用于下一次 FETCH
+                req = alloc_fetch_req()
+                ctypes.memmove(ctypes.addressof(req),
+                               ctypes.addressof(batch.reqs[i]),
+                               ctypes.sizeof(QuantumFetchReq))
+                reqs.append(req)
+            return reqs
+
+    req = ioctl_fetch(fd)
+    return [req] if req is not None else []
+
+def ioctl_commit_batch(fd, commits):
+    """
+    通过 QIOC_COMMIT_BATCH 提交一组结果，每批最多 QUANTUM_BATCH_MAX 个
+    返回与 commits 一一对应的成功标志列表
+    内核不支持批量命令时回退为逐个 ioctl_commit
+    """
+    global _commit_batch_supported
+
+    oks = []
+    for start in range(0, len(commits), QUANTUM_BATCH_MAX):
+        chunk = commits[start:start + QUANTUM_BATCH_MAX]
+
+        if _commit_batch_supported and len(chunk) > 1:
+            batch       = _commit_batch
+            batch.count = len(chunk)
+            for i, commit in enumerate(chunk):
+                ctypes.memmove(ctypes.addressof(batch.commits[i]),
+                               ctypes.addressof(commit),
+                               ctypes.sizeof(QuantumCommitReq))
+            try:
+                _ioctl(fd, QIOC_COMMIT_BATCH, batch)
+                oks.extend([True] * len(chunk))
+                continue
+            except OSError as e:
+                if not _batch_unsupported(e):
+                    log.warning("QIOC_COMMIT_BATCH failed: %s", e)
+                    oks.extend([False] * len(chunk))
+                    continue
+                log.info("QIOC_COMMIT_BATCH not supported, using QIOC_COMMIT")
+                _commit_batch_supported = False
+
+        oks.extend(ioctl_commit(fd, commit) for commit in chunk)
+    return oks
+
 # ================================================================
 # 量子线路执行
 # ================================================================
 
 _simulator = AerSimulator()
 
-def run_circuit(qasm_str, shots):
+def _make_gpu_simulator():
     """
-    使用 Qiskit Aer 执行量子线路
+    构造 GPU 后端（需要 qiskit-aer-gpu 与可用的 CUDA 设备）
+    不可用时返回 None，所有任务继续走 CPU
+    """
+    try:
+        if "GPU" not in _simulator.available_devices():
+            return None
+        return AerSimulator(method="statevector", device="GPU",
+                            cuStateVec_enable=True)
+    except Exception as e:
+        log.debug("GPU simulator unavailable: %s", e)
+        return None
 
-    qasm_str: 纯 QASM 字符串（内核 FETCH 时已剥离配置头）
-    shots:    测量次数
-    返回 counts dict，如 {'00': 512, '11': 488}
+_gpu_simulator = _make_gpu_simulator()
+
+# 比特数达到该值的线路分派到 GPU：大比特数下 CPU 受内存带宽限制，
+# GPU 高带宽显存收益明显（可由 --gpu-threshold 覆盖）
+GPU_THRESHOLD = 20
+
+# 线路缓存容量：QKD/VQE 等负载会反复提交相同子线路（仅 shots 不同）
+CIRCUIT_CACHE_SIZE = 256
+
+@functools.lru_cache(maxsize=CIRCUIT_CACHE_SIZE)
+def _load_circuit(qasm_bytes):
     """
+    解析 QASM 并补全测量，结果按 FETCH 缓冲区中的原始字节缓存
+    以 bytes 为键：命中时连 UTF-8 解码都省去，只需对原始字节做一次哈希
+    返回的 QuantumCircuit 会被多个任务共享，调用方不得修改
+    """
+    # 解码 QASM（内核已剥离配置头，直接使用）
+    qasm_str = qasm_bytes.decode("utf-8", errors="replace")
+
     # 解析 QASM
     try:
         qc = qasm2_loads(qasm_str)
     except Exception as e:
         raise RuntimeError(f"QASM parse error: {e}") from e
 
-    # 若无 measure 指令则自动补全 measure_all()
-    from qiskit.circuit import Measure
-    has_measure = any(
-        isinstance(inst.operation, Measure) for inst in qc.data
-    )
-    if not has_measure:
+    _ensure_measure(qc)
+    return qc
+
+# 二进制门序列：每条记录 struct { u8 opcode; u8 q0; u8 q1; f32 param; }（紧凑排列）
+# opcode=0 表示序列结束；MEASURE 将 q0 测量到经典比特 q1
+_QIR_RECORD = struct.Struct("<BBBf")
+
+QIR_OP_END     = 0
+QIR_OP_MEASURE = 12
+
+_QIR_GATES_1Q = {
+    1: QuantumCircuit.h,
+    2: QuantumCircuit.x,
+    3: QuantumCircuit.y,
+    4: QuantumCircuit.z,
+    5: QuantumCircuit.s,
+    6: QuantumCircuit.t,
+}
+_QIR_GATES_ROT = {
+    7: QuantumCircuit.rx,
+    8: QuantumCircuit.ry,
+    9: QuantumCircuit.rz,
+}
+_QIR_GATES_2Q = {
+    10: QuantumCircuit.cx,
+    11: QuantumCircuit.cz,
+}
+
+def _qir_bytes(req):
+    """取 qasm 字段的原始字节（二进制格式含 0 字节，不能按 C 字符串截断）"""
+    return ctypes.string_at(ctypes.addressof(req) + QuantumFetchReq.qasm.offset,
+                            QUANTUM_QIR_SIZE)
+
+def _build_circuit_from_binary(buf, num_qubits):
+    """
+    由内核生成的二进制门序列直接构造线路，绕过 QASM 文本解析
+    非法 opcode 或比特越界时抛出 RuntimeError（按编译失败处理）
+    """
+    qc  = QuantumCircuit(num_qubits)
+    end = len(buf) - len(buf) % _QIR_RECORD.size
+
+    for op, q0, q1, param in _QIR_RECORD.iter_unpack(buf[:end]):
+        if op == QIR_OP_END:
+            break
+        if q0 >= num_qubits or q1 >= num_qubits:
+            raise RuntimeError(f"binary QIR: qubit out of range (op={op})")
+
+        if op in _QIR_GATES_1Q:
+            _QIR_GATES_1Q[op](qc, q0)
+        elif op in _QIR_GATES_ROT:
+            _QIR_GATES_ROT[op](qc, param, q0)
+        elif op in _QIR_GATES_2Q:
+            _QIR_GATES_2Q[op](qc, q0, q1)
+        elif op == QIR_OP_MEASURE:
+            if not qc.clbits:
+                qc.add_register(ClassicalRegister(num_qubits, "c"))
+            qc.measure(q0, q1)
+        else:
+            raise RuntimeError(f"binary QIR: unknown opcode {op}")
+
+    _ensure_measure(qc)
+    return qc
+
+def _ensure_measure(qc):
+    """若无 measure 指令则自动补全 measure_all()"""
+    # count_ops() 在 Qiskit 内部统计，避免在 Python 层逐条 isinstance 遍历 qc.data
+    if "measure" not in qc.count_ops():
         qc.measure_all()
 
+# Aer 可用的 OpenMP 线程总数，跟随本进程 CPU 亲和性（见 set_cpu_affinity）
+_aer_threads = len(os.sched_getaffinity(0))
+
+# 同时执行的任务数（流水线线程池大小），各任务平分 _aer_threads，避免超额订阅
+_pipeline_workers = 1
+
+def set_cpu_affinity(cpus):
+    """
+    把本进程绑定到 cpus，并让 Aer 线程数与之一致
+    之后创建的 OpenMP 线程继承该亲和性；Linux 首次访问分配策略使 statevector
+    落在这些 CPU 所在 NUMA 节点的内存中
+    """
+    global _aer_threads
+    os.sched_setaffinity(0, cpus)
+    _aer_threads = len(cpus)
+
+def _run_options(num_qubits):
+    """
+    按比特数生成 Aer 运行参数
+    Aer 默认 fusion_threshold=14，切分后的小子线路完全享受不到门融合，
+    这里按比特数降低阈值，让小线路也能合并成更大的融合矩阵乘
+    """
+    return {
+        "fusion_enable":        True,
+        "fusion_threshold":     max(4, num_qubits // 3),
+        "fusion_max_qubit":     5,
+        "max_parallel_threads": max(1, _aer_threads // _pipeline_workers),
+    }
+
+def run_circuit(qc, shots, num_qubits):
+    """
+    使用 Qiskit Aer 执行量子线路
+
+    qc:         已补全测量的 QuantumCircuit（见 _load_circuit / _build_circuit_from_binary）
+    shots:      测量次数
+    num_qubits: 线路比特数（用于调整门融合参数）
+    返回 counts dict，如 {'00': 512, '11': 488}
+
+    注意：AerSimulator.run 不会调用 transpile()/预设 PassManager，线路按原样
+    转换为 Aer 内部表示执行；内核已转译的子线路无需任何"跳过转译"选项
+    （skip_transpilation 等并非 Aer 运行参数，传入只会触发未知选项警告）
+    """
+    # 极小线路走 NumPy 快速路径，不支持的指令返回 None 后继续交给 Aer
+    if qc.num_qubits <= fast_sim.MAX_QUBITS:
+        counts = fast_sim.simulate(qc, shots)
+        if counts is not None:
+            return counts
+
+    options = _run_options(num_qubits)
+
+    # 大线路优先走 GPU，GPU 执行失败（如显存不足）时回退到 CPU
+    if _gpu_simulator is not None and num_qubits >= GPU_THRESHOLD:
+        try:
+            return _gpu_simulator.run(qc, shots=shots, **options).result().get_counts()
+        except Exception as e:
+            log.warning("GPU execution failed, falling back to CPU: %s", e)
+
     # 执行
-    job    = _simulator.run(qc, shots=shots)
+    job    = _simulator.run(qc, shots=shots, **options)
     result = job.result()
     return result.get_counts()
 
-def execute_task(req):
+# ================================================================
+# 子线路多进程执行（NUMA 感知）
+#
+# need_split=1 的子线路彼此独立，分派到进程池并行执行；每个工作进程绑定到
+# 一个 NUMA 节点，使各自的 statevector 落在本节点内存与末级缓存中
+# ================================================================
+
+_split_pool      = None
+_split_workers   = 0
+_split_pool_lock = threading.Lock()   # 保护进程池重建（多个执行线程可能同时发现池已损坏）
+
+def _parse_cpulist(text):
+    """解析内核 cpulist 格式（如 "0-3,8-11"）为 CPU 编号列表"""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+def numa_cpu_sets():
     """
-    执行一个 FETCH 到的任务（或子线路），返回填好的 QuantumCommitReq
+    返回每个 NUMA 节点上本进程可用的 CPU 列表，如 [[0,1,2,3], [4,5,6,7]]
+    无 NUMA 信息时视为单节点
+    """
+    allowed = os.sched_getaffinity(0)
+    base    = "/sys/devices/system/node"
+    sets    = []
+    try:
+        nodes = sorted(int(name[4:]) for name in os.listdir(base)
+                       if name.startswith("node") and name[4:].isdigit())
+    except OSError:
+        nodes = []
+    for node in nodes:
+        try:
+            with open(f"{base}/node{node}/cpulist") as fp:
+                cpus = [c for c in _parse_cpulist(fp.read()) if c in allowed]
+        except OSError:
+            continue
+        if cpus:
+            sets.append(cpus)
+    return sets or [sorted(allowed)]
+
+def numa_node_cpus(node):
+    """返回指定 NUMA 节点上本进程可用的 CPU 列表，节点不存在时返回空列表"""
+    allowed = os.sched_getaffinity(0)
+    try:
+        with open(f"/sys/devices/system/node/node{node}/cpulist") as fp:
+            return [c for c in _parse_cpulist(fp.read()) if c in allowed]
+    except OSError:
+        return []
+
+def _init_split_worker(cpu_sets, counter, gpu_threshold):
+    """
+    工作进程初始化：按启动顺序轮流绑定到各 NUMA 节点
+    模块导入时已为本进程构造独立的 AerSimulator
+    """
+    global GPU_THRESHOLD
+    GPU_THRESHOLD = gpu_threshold
+
+    # Ctrl-C / systemd 停止时信号会发给整个进程组；工作进程忽略信号，
+    # 由主进程提交完在途任务后通过 stop_split_pool() 统一关闭
+    signal.signal(signal.SIGINT,  signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    set_cpu_affinity(cpu_sets[index % len(cpu_sets)])
+
+def start_split_pool(num_workers):
+    """启动子线路进程池，num_workers<=0 时不启用（子线路在线程池内执行）"""
+    global _split_pool, _split_workers
+    _split_workers = num_workers
+    if num_workers <= 0:
+        return
+
+    # 主进程已有线程在运行，使用 spawn 避免 fork 继承锁状态
+    ctx      = multiprocessing.get_context("spawn")
+    cpu_sets = numa_cpu_sets()
+    _split_pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=ctx,
+        initializer=_init_split_worker,
+        initargs=(cpu_sets, ctx.Value("i", 0), GPU_THRESHOLD),
+    )
+    log.info("split pool: %d workers over %d NUMA node(s)",
+             num_workers, len(cpu_sets))
+
+def stop_split_pool():
+    global _split_pool
+    if _split_pool is not None:
+        _split_pool.shutdown()
+        _split_pool = None
+
+def _restart_split_pool(broken):
+    """
+    工作进程异常退出（如被 OOM killer 杀死）后 ProcessPoolExecutor 永久不可用，
+    丢弃损坏的池并重建；broken 已被其他线程替换时不重复重建
+    """
+    global _split_pool
+    with _split_pool_lock:
+        if _split_pool is not broken:
+            return
+        _split_pool = None
+        broken.shutdown(wait=False)
+        start_split_pool(_split_workers)
+
+def dispatch_circuit(req, qc):
+    """
+    子线路交给进程池执行（若已启用），其余任务在当前线程执行
+    进程池损坏时重建，并在当前线程重新执行本任务
+    """
+    pool = _split_pool
+    if req.need_split and pool is not None:
+        try:
+            future = pool.submit(run_circuit, qc, req.shots, req.num_qubits)
+            return future.result()
+        except concurrent.futures.BrokenExecutor as e:
+            log.warning("qid=%d sub=%d split pool broken (%s), "
+                        "restarting pool and running in-thread",
+                        req.qid, req.sub_index, e)
+            _restart_split_pool(pool)
+    return run_circuit(qc, req.shots, req.num_qubits)
+
+def _top_outcomes(counts):
+    """
+    取计数最高的前 QUANTUM_MAX_OUTCOMES 个结果（按计数降序）
+    返回 (keys 列表, int32 计数数组)；计数数组可直接整块拷入 commit.counts
+    """
+    keys = list(counts)
+    cnts = np.fromiter(counts.values(), dtype=np.int32, count=len(keys))
+
+    # argpartition 为 O(n) 选择，只对选出的 32 个排序
+    if len(keys) > QUANTUM_MAX_OUTCOMES:
+        top = np.argpartition(-cnts, QUANTUM_MAX_OUTCOMES - 1)[:QUANTUM_MAX_OUTCOMES]
+    else:
+        top = np.arange(len(keys))
+    order = top[np.argsort(-cnts[top], kind="stable")]
+
+    return [keys[i] for i in order], cnts[order]
+
+def execute_task(req, commit):
+    """
+    执行一个 FETCH 到的任务（或子线路），结果填入 commit（由 alloc_commit_req 分配）
+    返回填好的 QuantumCommitReq
     """
-    commit            = QuantumCommitReq()
     commit.qid        = req.qid
     commit.shots      = req.shots
     commit.need_split = req.need_split
     commit.sub_index  = req.sub_index
 
-    # 解码 QASM（内核已剥离配置头，直接使用）
-    qasm_str = req.qasm.decode("utf-8", errors="replace").rstrip("\x00")
+    binary = req.format == QIR_FORMAT_BINARY
+    if not binary:
+        # ctypes 读取 c_char 数组字段时已在 C 层截断到第一个 NUL，无需再 rstrip
+        qasm_bytes = req.qasm
 
-    total_subs = req.num_sub_circuits if req.need_split else 1
-    log.info("executing qid=%d sub=%d/%d shots=%d qubits=%d",
-             req.qid, req.sub_index + 1, total_subs,
-             req.shots, req.num_qubits)
-    log.debug("qasm=\n%s", qasm_str[:200])
+    # 热路径日志：级别未开启时连参数（切片、dict 构造）都不计算
+    if log.isEnabledFor(logging.INFO):
+        total_subs = req.num_sub_circuits if req.need_split else 1
+        log.info("executing qid=%d sub=%d/%d shots=%d qubits=%d",
+                 req.qid, req.sub_index + 1, total_subs,
+                 req.shots, req.num_qubits)
+    if not binary and log.isEnabledFor(logging.DEBUG):
+        log.debug("qasm=\n%s", qasm_bytes[:200].decode("utf-8", errors="replace"))
 
     try:
-        counts   = run_circuit(qasm_str, req.shots)
-        outcomes = sorted(counts.items(), key=lambda x: -x[1])
+        if binary:
+            qc = _build_circuit_from_binary(_qir_bytes(req), req.num_qubits)
+        else:
+            qc = _load_circuit(qasm_bytes)
+        counts   = dispatch_circuit(req, qc)
+        # 只需前 QUANTUM_MAX_OUTCOMES 个结果，无需对全部 counts 排序
+        keys, cnts = _top_outcomes(counts)
 
         commit.success      = 1
-        commit.num_outcomes = min(len(outcomes), QUANTUM_MAX_OUTCOMES)
-
-        for i, (key, cnt) in enumerate(outcomes[:QUANTUM_MAX_OUTCOMES]):
-            key_bytes = key.encode("utf-8")[:QUANTUM_KEY_LEN - 1]
-            ctypes.memmove(commit.keys[i], key_bytes, len(key_bytes))
-            commit.counts[i] = cnt
-
-        log.info("qid=%d sub=%d done: %s",
-                 req.qid, req.sub_index,
-                 dict(list(outcomes)[:4]))
+        commit.num_outcomes = len(keys)
+        ctypes.memmove(commit.counts, cnts.ctypes.data, cnts.nbytes)
+
+        # 通过扁平 memoryview 直接切片写入 keys，避免每个 key 一次 ctypes 调用
+        # 比特串只含 '0'/'1'/空格，按 ASCII 编码即可
+        keys_mv = memoryview(commit.keys).cast("B")
+        for i, key in enumerate(keys):
+            key_bytes = key.encode("ascii")[:QUANTUM_KEY_LEN - 1]
+            offset    = i * QUANTUM_KEY_LEN
+            keys_mv[offset:offset + len(key_bytes)] = key_bytes
+
+        if log.isEnabledFor(logging.INFO):
+            log.info("qid=%d sub=%d done: %s",
+                     req.qid, req.sub_index,
+                     dict(zip(keys[:4], cnts[:4].tolist())))
+
+    except concurrent.futures.BrokenExecutor as e:
+        # 执行池损坏（BrokenExecutor 是 RuntimeError 子类，须先于 QASM 错误分支捕获）
+        log.error("qid=%d sub=%d executor error: %s",
+                  req.qid, req.sub_index, e)
+        commit.success    = 0
+        commit.error_code = 6   # QERR_BACKEND_FAIL
+        commit.error_info = str(e)[:127].encode("utf-8")
 
     except RuntimeError as e:
         # QASM 解析失败
@@ -263,11 +753,66 @@ def execute_task(req):
 
 _running = True
 
+# 流水线执行线程数上限；同时在途（已 FETCH 未 COMMIT）的任务数为执行线程数 + 1
+PIPELINE_DEPTH = 4
+
+# 自适应轮询下限（秒）：连续取到任务时等待时间减半，直至该值；
+# 连续空轮询时翻倍，直至 --interval
+MIN_POLL_INTERVAL = 1e-4
+
 def handle_signal(signum, frame):
     global _running
     log.info("received signal %d, shutting down gracefully...", signum)
     _running = False
 
+def commit_finished(fd, inflight, timeout=0):
+    """
+    提交 inflight 中已执行完毕的任务，并归还其 FETCH/COMMIT 缓冲区
+    timeout=0 时只检查不等待；否则最多等待 timeout 秒（None 为无限）直到至少一个完成
+    """
+    if timeout != 0 and inflight:
+        concurrent.futures.wait([fut for _, fut in inflight], timeout=timeout,
+                                return_when=concurrent.futures.FIRST_COMPLETED)
+
+    pending = []
+    done    = []
+    for req, fut in inflight:
+        if fut.done():
+            done.append((req, fut.result()))
+        else:
+            pending.append((req, fut))
+    inflight[:] = pending
+
+    if not done:
+        return
+
+    oks = ioctl_commit_batch(fd, [commit for _, commit in done])
+    for (req, commit), ok in zip(done, oks):
+        release_fetch_req(req)
+
+        if ok:
+            log.debug("committed qid=%d sub=%d success=%d",
+                      commit.qid, commit.sub_index, commit.success)
+        else:
+            log.warning("commit failed for qid=%d sub=%d "
+                        "(kernel will timeout and reclaim)",
+                        commit.qid, commit.sub_index)
+        release_commit_req(commit)
+
+def open_poller(fd):
+    """
+    为设备 fd 创建 epoll，内核有 RUNNING 任务时设备报告 POLLIN
+    驱动未实现 .poll 时 epoll_ctl 返回 EPERM，此时返回 None，主循环回退到定时轮询
+    """
+    ep = select.epoll()
+    try:
+        ep.register(fd, select.EPOLLIN)
+    except OSError as e:
+        ep.close()
+        log.info("device does not support poll (%s), using sleep polling", e)
+        return None
+    return ep
+
 def open_device(path):
     """打开设备文件，返回文件对象，失败时返回 None"""
     try:
@@ -285,6 +830,8 @@ def open_device(path):
         return None
 
 def main():
+    global GPU_THRESHOLD, _pipeline_workers
+
     parser = argparse.ArgumentParser(
         description="QuantumOS backend daemon"
     )
@@ -294,6 +841,18 @@ def main():
     parser.add_argument("--interval",
                         type=float, default=0.5,
                         help="无任务时的轮询间隔（秒，默认 0.5）")
+    parser.add_argument("--gpu-threshold",
+                        type=int, default=GPU_THRESHOLD,
+                        help="比特数不小于该值的线路使用 GPU 执行（默认 %d）"
+                             % GPU_THRESHOLD)
+    parser.add_argument("--split-workers",
+                        type=int, default=None,
+                        help="子线路执行进程数（默认：多 NUMA 节点时每节点一个，"
+                             "单节点时不启用；0 为不启用）")
+    parser.add_argument("--numa-node",
+                        type=int, default=None,
+                        help="把 daemon 及 Aer 线程绑定到指定 NUMA 节点；多节点部署时"
+                             "每节点启动一个 daemon，并配合 numactl --membind=N 使用")
     parser.add_argument("--verbose",
                         action="store_true",
                         help="DEBUG 级别日志")
@@ -302,6 +861,21 @@ def main():
     if args.verbose:
         log.setLevel(logging.DEBUG)
 
+    GPU_THRESHOLD = args.gpu_threshold
+
+    # NUMA 绑定须在任何 Aer 线程创建之前完成
+    if args.numa_node is not None:
+        cpus = numa_node_cpus(args.numa_node)
+        if not cpus:
+            log.error("NUMA node %d has no usable CPUs", args.numa_node)
+            sys.exit(1)
+        set_cpu_affinity(cpus)
+        # 本进程的 OpenMP 运行时已随 qiskit_aer 导入完成初始化，
+        # 以下设置作用于之后 spawn 的子线路工作进程
+        os.environ["OMP_PROC_BIND"] = "close"
+        os.environ["OMP_PLACES"]    = "cores"
+        log.info("pinned to NUMA node %d (cpus=%s)", args.numa_node, cpus)
+
     # 注册信号处理
     signal.signal(signal.SIGINT,  handle_signal)
     signal.signal(signal.SIGTERM, handle_signal)
@@ -310,6 +884,10 @@ def main():
              args.dev, args.interval)
     log.info("Aer backend: %s",
              _simulator.configuration().backend_name)
+    if _gpu_simulator is not None:
+        log.info("GPU backend enabled for qubits >= %d", GPU_THRESHOLD)
+    else:
+        log.info("GPU backend not available, using CPU only")
 
     # 启动时校验结构体大小（不匹配直接退出）
     verify_struct_sizes()
@@ -320,31 +898,73 @@ def main():
         sys.exit(1)
 
     fd = f.fileno()
+    ep = open_poller(fd)
     log.info("device opened (fd=%d), entering poll loop...", fd)
 
+    # 子线路进程池（按 NUMA 节点分布）
+    split_workers = args.split_workers
+    if split_workers is None:
+        num_nodes     = len(numa_cpu_sets())
+        split_workers = num_nodes if num_nodes > 1 else 0
+    start_split_pool(split_workers)
+
+    # Aer 在 C++ 执行期间释放 GIL，线程池即可让模拟与下一次 FETCH 重叠
+    # 在途任务最多比执行线程多一个：只预取下一个任务，不囤积内核已标记为
+    # RUNNING 的任务（否则其超时回收计时在队列中白白流逝，也会抢走其他 daemon 的任务）
+    workers           = max(1, min(PIPELINE_DEPTH, _aer_threads // 2))
+    max_inflight      = workers + 1
+    _pipeline_workers = workers
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    inflight = []   # [(req, future)]，最多 max_inflight 个
+    backoff  = MIN_POLL_INTERVAL
+    ready    = False    # 上一次 epoll 报告可读
+
     # 主轮询循环
     while _running:
-        req = ioctl_fetch(fd)
+        commit_finished(fd, inflight)
+
+        if len(inflight) >= max_inflight:
+            # 流水线已满，等待最早完成的任务
+            commit_finished(fd, inflight, timeout=args.interval)
+            continue
 
-        if req is None:
-            # 无待执行任务，等待后重试
-            time.sleep(args.interval)
+        reqs = ioctl_fetch_batch(fd, max_inflight - len(inflight))
+
+        if not reqs:
+            # 无待执行任务：有在途任务时等待其完成，否则等待后重试
+            # 无在途任务时优先阻塞在 epoll 上，任务入队即唤醒；
+            # interval 作为超时兜底，防止漏掉唤醒
+            # 其余情况按指数退避等待：任务密集时延迟低，长时间空闲时唤醒少
+            # 任务在 COMMIT 前一直处于 RUNNING，POLLIN 为水平触发且可能无法被本
+            # daemon 取到（如已被其他 daemon 取走），epoll 报告可读但 FETCH 仍为空时
+            # 必须退避睡眠，否则会空转占满 CPU
+            if inflight:
+                commit_finished(fd, inflight, timeout=backoff)
+            elif ep is not None and not ready:
+                ready = bool(ep.poll(args.interval))
+            else:
+                time.sleep(backoff)
+                ready = False
+            backoff = min(backoff * 2, args.interval)
             continue
 
-        log.info("fetched qid=%d need_split=%d sub=%d",
-                 req.qid, req.need_split, req.sub_index)
+        backoff = max(backoff / 2, MIN_POLL_INTERVAL)
+        ready   = False
 
-        commit = execute_task(req)
-        ok     = ioctl_commit(fd, commit)
+        for req in reqs:
+            log.info("fetched qid=%d need_split=%d sub=%d",
+                     req.qid, req.need_split, req.sub_index)
+            commit = alloc_commit_req()
+            inflight.append((req, executor.submit(execute_task, req, commit)))
 
-        if ok:
-            log.debug("committed qid=%d sub=%d success=%d",
-                      commit.qid, commit.sub_index, commit.success)
-        else:
-            log.warning("commit failed for qid=%d sub=%d "
-                        "(kernel will timeout and reclaim)",
-                        commit.qid, commit.sub_index)
+    # 退出前提交所有在途任务
+    while inflight:
+        commit_finished(fd, inflight, timeout=None)
+    executor.shutdown()
+    stop_split_pool()
 
+    if ep is not None:
+        ep.close()
     f.close()
     log.info("daemon stopped")
 